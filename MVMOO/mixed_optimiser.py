@@ -28,6 +28,19 @@ class MVO():
         else:
             self.bounds = bounds
 
+        # Cache the bounds scaling, qualitative columns pass through unchanged
+        self._lo = np.zeros(input_dim)
+        self._lo[:self.num_quant] = self.bounds[0,:self.num_quant]
+        self._span = np.ones(input_dim)
+        self._span[:self.num_quant] = self.bounds[1,:self.num_quant] - self.bounds[0,:self.num_quant]
+        self._inv_span = 1.0 / self._span
+
+        # Continuous variable bounds in the (min, max) pair form scipy expects
+        self._cont_bounds_tuple = list(map(tuple, self.bounds[:,:self.num_quant].T))
+
+        # Halton designs are deterministic, keyed by (num_quant, samples)
+        self._halton_cache = {}
+
     def halton(self, dim, n_sample):
         """Halton sequence.
         :param int dim: dimension
@@ -90,7 +103,10 @@ class MVO():
         if design == 'random':
             Xquant = np.random.random_sample((samples,self.num_quant))
         elif design == 'halton':
-            Xquant = self.halton(self.num_quant, samples)
+            key = (self.num_quant, samples)
+            if key not in self._halton_cache:
+                self._halton_cache[key] = self.halton(self.num_quant, samples)
+            Xquant = self._halton_cache[key]
         elif design == 'sobol':
             Xquant = sobol_seq.i4_sobol_generate(self.num_quant, samples)
         elif design == 'lhc':
@@ -146,6 +162,13 @@ class MVO():
         else:
             raise ValueError("Select either 'meanstd' or 'bounds' scaling")
 
+    def _scale_bounds(self, X):
+        """
+        Scale the continuous variables to the unit hypercube using the cached
+        bounds, equivalent to scaleX(X, mode='bounds')
+        """
+        return (X - self._lo) * self._inv_span
+
     def scaley(self, y, mode='meanstd'):
         """
         Scale the output variables
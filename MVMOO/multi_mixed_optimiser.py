@@ -1,9 +1,96 @@
+import math
 import numpy as np
-from scipy.stats import norm
+from scipy.special import ndtr
 from .mixed_optimiser import MVO
 from scipy.optimize import shgo, differential_evolution, dual_annealing
 import scipy as stats
 
+# Python float so it does not promote float32 arrays
+_INV_SQRT_2PI = float(1.0 / np.sqrt(2 * np.pi))
+_INV_SQRT_2 = float(1.0 / np.sqrt(2))
+
+# Smallest candidate batch worth dispatching to the parallel Numba kernel
+_NUMBA_MIN_POINTS = 1024
+
+try:
+    from numba import njit, prange
+    _HAS_NUMBA = True
+except ImportError:
+    _HAS_NUMBA = False
+
+
+if _HAS_NUMBA:
+    @njit(cache=True, fastmath=True)
+    def _bnl_front(costs, window):
+        """
+        Block-nested-loop scan for the non-dominated rows of costs (minimisation)
+        :param costs: An (n_points, n_costs) array
+        :param window: A scratch array of at least (n_points, n_costs)
+        :return: An (n_points, ) boolean mask of the efficient points
+        """
+        n_points, n_costs = costs.shape
+        window_ind = np.empty(n_points, dtype=np.int64)
+        n_window = 0
+        for i in range(n_points):
+            dominated = False
+            j = 0
+            while j < n_window:
+                window_le = True
+                point_le = True
+                for k in range(n_costs):
+                    if window[j,k] > costs[i,k]:
+                        window_le = False
+                    elif window[j,k] < costs[i,k]:
+                        point_le = False
+                if window_le:
+                    dominated = True
+                    break
+                if point_le:
+                    # Point dominates this window entry, swap in the last entry
+                    n_window -= 1
+                    window[j,:] = window[n_window,:]
+                    window_ind[j] = window_ind[n_window]
+                else:
+                    j += 1
+            if not dominated:
+                window[n_window,:] = costs[i,:]
+                window_ind[n_window] = i
+                n_window += 1
+
+        on_front = np.zeros(n_points, dtype=np.bool_)
+        for j in range(n_window):
+            on_front[window_ind[j]] = True
+        return on_front
+
+    @njit(cache=True, parallel=True, fastmath=True)
+    def _hv_improvement_kernel(u, std, f, c, r_minus_f, base, out):
+        """
+        Minimum hypervolume improvement over the front for each candidate,
+        parallel over candidates and written into out
+        :param u: An (nx, nobj) array of model means
+        :param std: An (nx, nobj) array of model standard deviations
+        :param f: An (nfx, nobj) array of the current front
+        :param c: An (nfx, nobj) array of contextual offsets
+        :param r_minus_f: An (nfx, nobj) array of the reference point minus the front
+        :param base: An (nfx, ) array of the product of r_minus_f over objectives
+        :param out: An (nx, ) array for the result
+        """
+        nx, nobj = u.shape
+        nfx = f.shape[0]
+        for ix in prange(nx):
+            best = np.inf
+            for k in range(nfx):
+                prod = 1.0
+                for j in range(nobj):
+                    diff = f[k,j] - u[ix,j]
+                    z = (diff - c[k,j]) / std[ix,j]
+                    ei = diff * 0.5 * math.erfc(-z * _INV_SQRT_2) + \
+                        std[ix,j] * math.exp(-0.5 * z * z) * _INV_SQRT_2PI
+                    prod *= r_minus_f[k,j] + ei
+                if prod - base[k] < best:
+                    best = prod - base[k]
+            out[ix] = best
+
 class MVMOO(MVO):
     """
     Multi variate mixed variable optimisation
@@ -27,14 +114,27 @@ class MVMOO(MVO):
         if scale is True:
             self.Yscaled = self.scaley(Y)
             self.Xscaled = self.scaleX(X,mode=self.scale)
+            # (nobj, nsamples, 1) so each objective is a contiguous column
+            Ycols = np.ascontiguousarray(self.Yscaled.T)[:,:,None]
             for i in range(nobj):
-                self.fitmodel(self.Xscaled, self.Yscaled[:,i].reshape((-1,1)), variance=variance)
+                self.fitmodel(self.Xscaled, Ycols[i], variance=variance)
                 models.append(self.model)
             return models
+        Ycols = np.ascontiguousarray(Y.T)[:,:,None]
         for i in range(nobj):
-            self.fitmodel(X, Y[:,i].reshape((-1,1)))
+            self.fitmodel(X, Ycols[i])
             models.append(self.model)
-            return models
+        return models
+
+    def _try_fit(self, X, Y, variance=1.0):
+        """
+        Attempt to generate the models, returns whether the fit succeeded and
+        the models (None if it failed)
+        """
+        try:
+            return True, self.generatemodels(X, Y, variance=variance)
+        except Exception:
+            return False, None
 
     def is_pareto_efficient(self, costs, return_mask = True):
         """
@@ -45,21 +145,39 @@ class MVMOO(MVO):
             If return_mask is True, this will be an (n_points, ) boolean array
             Otherwise it will be a (n_efficient_points, ) integer array of indices.
         """
-        is_efficient = np.arange(costs.shape[0])
-        n_points = costs.shape[0]
-        next_point_index = 0  # Next index in the is_efficient array to search for
-        while next_point_index<len(costs):
-            nondominated_point_mask = np.any(costs<costs[next_point_index], axis=1)
-            nondominated_point_mask[next_point_index] = True
-            is_efficient = is_efficient[nondominated_point_mask]  # Remove dominated points
-            costs = costs[nondominated_point_mask]
-            next_point_index = np.sum(nondominated_point_mask[:next_point_index])+1
+        n_points, n_costs = costs.shape
+        on_front = np.zeros(n_points, dtype=bool)
+        if n_points == 0:
+            return on_front if return_mask else np.flatnonzero(on_front)
+
+        # Sort lexicographically so the leading point is always non-dominated
+        order = np.lexsort(costs.T[::-1])
+        if n_costs == 2:
+            # A sorted point is efficient if it strictly improves the running minimum of the second objective
+            cummin = np.minimum.accumulate(costs[order,1])
+            sorted_front = np.empty(n_points, dtype=bool)
+            sorted_front[0] = True
+            sorted_front[1:] = cummin[1:] < cummin[:-1]
+            on_front[order] = sorted_front
+        elif _HAS_NUMBA:
+            buf = getattr(self, '_front_buf', None)
+            if buf is None or buf.shape[0] < n_points or buf.shape[1] != n_costs:
+                buf = np.empty((n_points, n_costs))
+                self._front_buf = buf
+            on_front[order] = _bnl_front(np.ascontiguousarray(costs[order], dtype=np.float64), buf)
+        else:
+            vals = costs[order]
+            idx = order
+            while len(vals):
+                on_front[idx[0]] = True
+                nondominated_point_mask = np.any(vals < vals[0], axis=1)
+                vals = vals[nondominated_point_mask]
+                idx = idx[nondominated_point_mask]
+
         if return_mask:
-            is_efficient_mask = np.zeros(n_points, dtype = bool)
-            is_efficient_mask[is_efficient] = True
-            return is_efficient_mask
+            return on_front
         else:
-            return is_efficient
+            return np.flatnonzero(on_front)
 
     def paretofront(self, Y):
         """
@@ -68,69 +186,167 @@ class MVMOO(MVO):
         ind = self.is_pareto_efficient(Y, return_mask=False)
         return Y[ind,:]
 
-    def EIM(self, X, mode='euclidean'):
+    def _set_front(self, front):
         """
-        Calculate the expected improvment matrix for a candidate point
+        Set the current pareto front, ordered by the first objective, and cache
+        the quantities derived from it for the acquisition functions
+        """
+        front = front[np.argsort(front[:,0], kind='stable')]
+        self.currentfront = front
+        self._r = 1.1 * np.ones((1, np.shape(front)[1]))
+        self._r_minus_f = self._r - front
+        self._base_hv = np.prod(self._r_minus_f, axis=1)[:,None]
+        self._f_T_expand = front[:,:,None]
+
+    def _workspace(self, name, shape, dtype):
+        """
+        Return the scratch array stored on self under name, reallocating it
+        only when the requested shape or dtype changes
+        """
+        buf = getattr(self, name, None)
+        if buf is None or buf.shape != shape or buf.dtype != dtype:
+            buf = np.empty(shape, dtype=dtype)
+            setattr(self, name, buf)
+        return buf
 
-        @ARTICLE{7908974, 
-            author={D. {Zhan} and Y. {Cheng} and J. {Liu}}, 
-            journal={IEEE Transactions on Evolutionary Computation}, 
-            title={Expected Improvement Matrix-Based Infill Criteria for Expensive Multiobjective Optimization}, 
-            year={2017}, 
-            volume={21}, 
-            number={6}, 
-            pages={956-975}, 
-            doi={10.1109/TEVC.2017.2697503}, 
-            ISSN={1089-778X}, 
-            month={Dec}}
+    def _ei_matrix(self, u, std, c=None):
         """
-        f = self.currentfront
+        Expected improvement of each candidate over each front point, with an
+        optional contextual offset c, as an (nfx, nobj, nx) array
+        """
+        # Let broadcasting expand to (nfx, nobj, nx) rather than tiling each operand
+        u_b = u.T[None,:,:]
+        s_b = std.T[None,:,:]
+        f_b = self._f_T_expand.astype(u.dtype, copy=False)
+        shape = (f_b.shape[0], f_b.shape[1], u_b.shape[2])
+
+        # All (nfx, nobj, nx) intermediates live in reused buffers, the returned
+        # array is overwritten by the next call
+        diff = np.subtract(f_b, u_b, out=self._workspace('_diff_buf', shape, u.dtype))
+        Z_matrix = self._workspace('_z_buf', shape, u.dtype)
+        if c is None:
+            np.divide(diff, s_b, out=Z_matrix)
+        else:
+            np.subtract(diff, c[:,:,None], out=Z_matrix)
+            Z_matrix /= s_b
+
+        # std * pdf(Z)
+        EI_matrix = np.multiply(Z_matrix, Z_matrix, out=self._workspace('_ei_buf', shape, u.dtype))
+        EI_matrix *= -0.5
+        np.exp(EI_matrix, out=EI_matrix)
+        EI_matrix *= _INV_SQRT_2PI
+        EI_matrix *= s_b
+
+        # + (f - u) * cdf(Z)
+        ndtr(Z_matrix, out=Z_matrix)
+        np.multiply(diff, Z_matrix, out=Z_matrix)
+        EI_matrix += Z_matrix
+        return EI_matrix
+
+    def _hv_reduce(self, EI_matrix):
+        """
+        Minimum hypervolume improvement over the front for each candidate,
+        EI_matrix is overwritten
+        """
+        dtype = EI_matrix.dtype
+        hv = np.prod(np.add(self._r_minus_f[:,:,None].astype(dtype, copy=False), EI_matrix, out=EI_matrix), axis=1)
+        return np.subtract(hv, self._base_hv.astype(dtype, copy=False), out=hv).min(axis=0).reshape((-1,1))
+
+    def _hv_improvement(self, u, std, c=None):
+        """
+        Hypervolume based expected improvement matrix criterion from the model
+        mean and standard deviation
+        """
+        nx = np.shape(u)[0]
+        if _HAS_NUMBA and nx > _NUMBA_MIN_POINTS:
+            dtype = u.dtype
+            if c is None:
+                c = np.zeros(np.shape(self.currentfront), dtype=dtype)
+            out = np.empty(nx, dtype=dtype)
+            _hv_improvement_kernel(np.ascontiguousarray(u), np.ascontiguousarray(std),
+                                   self.currentfront.astype(dtype), np.ascontiguousarray(c, dtype=dtype),
+                                   self._r_minus_f.astype(dtype), self._base_hv.ravel().astype(dtype), out)
+            return out.reshape((-1,1))
+
+        return self._hv_reduce(self._ei_matrix(u, std, c))
+
+    def _predict_all(self, X, models=None, latent=False):
+        """
+        Predict the mean and standard deviation of every model at X, returned
+        as (nx, nmodels) arrays. Set latent to True to use predict_f rather
+        than predict_y
+        """
+        if models is None:
+            models = self.models
 
-        nfx = np.shape(f)[0]
-    
-        nobj = np.shape(f)[1]
-    
-        nx = np.shape(X)[0]
-    
-        r = 1.1 * np.ones((1, nobj))
-        y = np.zeros((nx, 1))
-    
         ulist = []
         varlist = []
 
-        X = self.scaleX(X, mode='bounds')
-    
-        for iobj in range(nobj):
-            u, var = self.models[iobj].predict_y(X)
+        for model in models:
+            if latent:
+                u, var = model.predict_f(X)
+            else:
+                u, var = model.predict_y(X)
             ulist.append(u)
             varlist.append(var)
-            
+
         u = np.concatenate(ulist, axis=1)
         var = np.concatenate(varlist, axis=1)
-        std = np.sqrt(np.maximum(0,var))
+        return u, np.sqrt(np.maximum(0,var))
 
-        u_matrix = np.reshape(u.T,(1,nobj,nx)) * np.ones((nfx,1,1))
-        s_matrix = np.reshape(std.T,(1,nobj,nx)) * np.ones((nfx,1,1))
-        f_matrix = f.reshape((nfx,nobj,1)) * np.ones((1,1,nx))
-        Z_matrix = (f_matrix - u_matrix) / s_matrix
-        EI_matrix = np.multiply((f_matrix - u_matrix), norm.cdf(Z_matrix)) + np.multiply(s_matrix, norm.pdf(Z_matrix))
-        if mode == 'euclidean':
-            y = np.min(np.sqrt(np.sum(EI_matrix**2,axis=1)),axis=0).reshape(-1,1)
-        elif mode == 'hypervolume':
-            y = np.min(np.prod(r.reshape(1,2,1)  - f_matrix + EI_matrix, axis=1) - np.prod(r - f, axis=1).reshape((-1,1)),axis=0).reshape((-1,1))
-        elif mode == 'maxmin':
+    def _eim_from_mu_sigma(self, u, std, mode='euclidean', c=None, dtype=np.float64):
+        """
+        Expected improvement matrix criterion from precomputed model mean and
+        standard deviation, no model calls are made. The criterion is evaluated
+        in dtype and returned as float64
+        """
+        u = u.astype(dtype, copy=False)
+        std = std.astype(dtype, copy=False)
+        if c is not None:
+            c = c.astype(dtype, copy=False)
+
+        if mode == 'hypervolume':
+            return self._hv_improvement(u, std, c).astype(np.float64, copy=False)
+
+        EI_matrix = self._ei_matrix(u, std, c)
+        if mode == 'maxmin':
             y = np.min(np.max(EI_matrix,axis=1),axis=0).reshape(-1,1)
+            return y.astype(np.float64, copy=False)
+
+        # Both reductions share EI_matrix, the euclidean one (einsum squares and
+        # sums over the objectives in a single pass) must come first as
+        # _hv_reduce overwrites EI_matrix
+        eu = np.sqrt(np.einsum('fon,fon->fn', EI_matrix, EI_matrix)).min(axis=0).reshape(-1,1)
+        if mode == 'euclidean':
+            y = eu
         elif mode == 'combine':
-            y = np.min(np.sqrt(np.sum(EI_matrix**2,axis=1)),axis=0).reshape(-1,1) +\
-                 np.min(np.prod(r.reshape(1,2,1)  - f_matrix + EI_matrix, axis=1) - \
-                     np.prod(r - f, axis=1).reshape((-1,1)),axis=0).reshape((-1,1))
+            y = eu + self._hv_reduce(EI_matrix)
         else:
-            y1 = np.min(np.sqrt(np.sum(EI_matrix**2,axis=1)),axis=0).reshape(-1,1)
-            y2 = np.min(np.prod(r.reshape(1,2,1)  - f_matrix + EI_matrix, axis=1) - np.prod(r - f, axis=1).reshape((-1,1)),axis=0).reshape((-1,1))
             #y3 = np.min(np.max(EI_matrix,axis=1),axis=0).reshape(-1,1)
-            return np.hstack((y1,y2))
+            y = np.hstack((eu, self._hv_reduce(EI_matrix)))
+
+        return y.astype(np.float64, copy=False)
+
+    def EIM(self, X, mode='euclidean'):
+        """
+        Calculate the expected improvment matrix for a candidate point
+
+        @ARTICLE{7908974, 
+            author={D. {Zhan} and Y. {Cheng} and J. {Liu}}, 
+            journal={IEEE Transactions on Evolutionary Computation}, 
+            title={Expected Improvement Matrix-Based Infill Criteria for Expensive Multiobjective Optimization}, 
+            year={2017}, 
+            volume={21}, 
+            number={6}, 
+            pages={956-975}, 
+            doi={10.1109/TEVC.2017.2697503}, 
+            ISSN={1089-778X}, 
+            month={Dec}}
+        """
+        X = self._scale_bounds(X)
+        u, std = self._predict_all(X)
 
-        return y
+        return self._eim_from_mu_sigma(u, std, mode)
 
     def CEIM_Hypervolume(self, X):
         """
@@ -148,48 +364,13 @@ class MVMOO(MVO):
             ISSN={1089-778X}, 
             month={Dec}}
         """
-        f = self.currentfront
-    
-        nobj = np.shape(f)[1]
-    
-        nx = np.shape(X)[0]
-    
-        r = 1.1 * np.ones((1, nobj))
-        y = np.zeros((nx, 1))
-    
-        ulist = []
-        varlist = []
-    
-        for iobj in range(nobj):
-            u, var = self.models[iobj].predict_y(X)
-            ulist.append(u)
-            varlist.append(var)
-            
-        u = np.concatenate(ulist, axis=1)
-        var = np.concatenate(varlist, axis=1)
-        std = np.sqrt(np.maximum(0,var))
-    
-        for ix in range(nx):
-            Z = (f - u[ix,:]) / std[ix,:]
-            EIM = np.multiply((f - u[ix,:]), norm.cdf(Z)) + np.multiply(std[ix,:], norm.pdf(Z))
-            y[ix] = np.min(np.prod(r - f + EIM, axis=1) - np.prod(r - f, axis=1))
+        u, std = self._predict_all(X)
+        y = self._eim_from_mu_sigma(u, std, 'hypervolume')
         
         # Constraints
-        ncon = len(self.constrainedmodels)
-
-        uconlist = []
-        varconlist = []
-    
-        for iobj in range(ncon):
-            ucon, varcon = self.constrainedmodels[iobj].predict_y(X)
-            uconlist.append(ucon)
-            varconlist.append(varcon)
-            
-        ucon = np.concatenate(uconlist, axis=1)
-        varcon = np.concatenate(varconlist, axis=1)
-        stdcon = np.sqrt(np.maximum(0,varcon))
+        ucon, stdcon = self._predict_all(X, models=self.constrainedmodels)
 
-        PoF = np.prod(norm.cdf((0 - ucon) / stdcon), axis=1).reshape(-1,1)
+        PoF = np.prod(ndtr((0 - ucon) / stdcon), axis=1).reshape(-1,1)
 
         return y * PoF
 
@@ -199,44 +380,9 @@ class MVMOO(MVO):
 
         Adaptive addition based on https://arxiv.org/pdf/1807.01279.pdf
         """
-        f = self.currentfront
-        c = self.contextual
+        u, std = self._predict_all(X)
 
-        nfx = np.shape(f)[0]
-    
-        nobj = np.shape(f)[1]
-    
-        nx = np.shape(X)[0]
-    
-        r = 1.1 * np.ones((1, nobj))
-        y = np.zeros((nx, 1))
-    
-        ulist = []
-        varlist = []
-    
-        for iobj in range(nobj):
-            u, var = self.models[iobj].predict_y(X)
-            ulist.append(u)
-            varlist.append(var)
-            
-        u = np.concatenate(ulist, axis=1)
-        var = np.concatenate(varlist, axis=1)
-        std = np.sqrt(np.maximum(0,var))
-
-        u_matrix = np.reshape(u.T,(1,nobj,nx)) * np.ones((nfx,1,1))
-        s_matrix = np.reshape(std.T,(1,nobj,nx)) * np.ones((nfx,1,1))
-        f_matrix = f.reshape((nfx,nobj,1)) * np.ones((1,1,nx))
-        c_matrix = c.reshape((nfx,nobj,1)) * np.ones((1,1,nx))
-        Z_matrix = (f_matrix - u_matrix - c_matrix) / s_matrix
-        EI_matrix = np.multiply((f_matrix - u_matrix), norm.cdf(Z_matrix)) + np.multiply(s_matrix, norm.pdf(Z_matrix))
-        y = np.min(np.prod(r.reshape(1,2,1)  - f_matrix + EI_matrix, axis=1) - np.prod(r - f, axis=1).reshape((-1,1)),axis=0).reshape((-1,1))
-    
-        #for ix in range(nx):
-        #    Z = (f - u[ix,:] - c) / std[ix,:]
-        #    EIM = np.multiply((f - u[ix,:]), norm.cdf(Z)) + np.multiply(std[ix,:], norm.pdf(Z))
-        #    y[ix] = np.min(np.prod(r - f + EIM, axis=1) - np.prod(r - f, axis=1))
-        
-        return y
+        return self._eim_from_mu_sigma(u, std, 'hypervolume', c=self.contextual)
 
     def AEIM_Euclidean(self, X):
         """
@@ -254,52 +400,41 @@ class MVMOO(MVO):
             ISSN={1089-778X}, 
             month={Dec}}
         """
-        f = self.currentfront
-        c = self.contextual
+        X = self._scale_bounds(X)
+        u, std = self._predict_all(X, latent=True)
 
-        nfx = np.shape(f)[0]
-    
-        nobj = np.shape(f)[1]
-    
-        nx = np.shape(X)[0]
+        return self._eim_from_mu_sigma(u, std, 'euclidean', c=self.contextual)
 
-        y = np.zeros((nx, 1))
-    
-        ulist = []
-        varlist = []
-        X = self.scaleX(X, mode='bounds')
-    
-        for iobj in range(nobj):
-            u, var = self.models[iobj].predict_f(X)
-            ulist.append(u)
-            varlist.append(var)
-            
-        u = np.concatenate(ulist, axis=1)
-        var = np.concatenate(varlist, axis=1)
-        std = np.sqrt(np.maximum(0,var))
-
-        u_matrix = np.reshape(u.T,(1,nobj,nx)) * np.ones((nfx,1,1))
-        s_matrix = np.reshape(std.T,(1,nobj,nx)) * np.ones((nfx,1,1))
-        f_matrix = f.reshape((nfx,nobj,1)) * np.ones((1,1,nx))
-        c_matrix = c.reshape((nfx,nobj,1)) * np.ones((1,1,nx))
-        Z_matrix = (f_matrix - u_matrix - c_matrix) / s_matrix
-        EI_matrix = np.multiply((f_matrix - u_matrix), norm.cdf(Z_matrix)) + np.multiply(s_matrix, norm.pdf(Z_matrix))
-        y = np.min(np.sqrt(np.sum(EI_matrix**2,axis=1)),axis=0).reshape(-1,1)
-
-        return y
+    def _xbuffer(self, Xqual):
+        """
+        Allocate a (1, input_dim) candidate row with the qualitative values
+        filled in. Each local optimisation gets its own buffer so the
+        wrappers only need to write the continuous values per evaluation
+        """
+        Xbuf = np.empty((1, self.input_dim))
+        Xbuf[0,self.num_quant:] = Xqual
+        return Xbuf
 
-    def EIMoptimiserWrapper(self, Xcont, Xqual, constraints=False, mode='euclidean'):
+    def EIMoptimiserWrapper(self, Xcont, Xqual, constraints=False, mode='euclidean', Xbuf=None):
 
-        X = np.concatenate((Xcont.reshape((1,-1)), Xqual.reshape((1,-1))), axis=1)
+        if Xbuf is None:
+            X = np.concatenate((Xcont.reshape((1,-1)), Xqual.reshape((1,-1))), axis=1)
+        else:
+            Xbuf[0,:self.num_quant] = Xcont
+            X = Xbuf
 
         if constraints is not False:
             return -self.CEIM_Hypervolume(X)
 
         return -self.EIM(X,mode).reshape(-1)
 
-    def AEIMoptimiserWrapper(self, Xcont, Xqual, constraints=False):
+    def AEIMoptimiserWrapper(self, Xcont, Xqual, constraints=False, Xbuf=None):
 
-        X = np.concatenate((Xcont.reshape((1,-1)), Xqual.reshape((1,-1))), axis=1)
+        if Xbuf is None:
+            X = np.concatenate((Xcont.reshape((1,-1)), Xqual.reshape((1,-1))), axis=1)
+        else:
+            Xbuf[0,:self.num_quant] = Xcont
+            X = Xbuf
 
         return -self.AEIM_Euclidean(X).reshape(-1)
         
@@ -313,12 +448,14 @@ class MVMOO(MVO):
             Xsamples = self.sample_design(samples=10000, design='halton')
 
             if constraints is False:
-                fvals = self.EIM(Xsamples, mode=mode)
+                u, std = self._predict_all(self._scale_bounds(Xsamples))
+                fvals = self._eim_from_mu_sigma(u, std, mode, dtype=np.float32)
             else:
                 fvals = self.CEIM_Hypervolume(Xsamples)
 
-            fmax = np.amax(fvals)
-            indymax = np.argmax(fvals)
+            # Single pass over fvals for both the maximum and its location
+            indymax = int(np.argmax(fvals))
+            fmax = fvals.flat[indymax]
             xmax = Xsamples[indymax,:]
             if values is None:
                 return fmax, xmax
@@ -327,28 +464,23 @@ class MVMOO(MVO):
             Xsamples = self.sample_design(samples=10000, design='halton')
 
             if constraints is False:
-                fvals = self.EIM(Xsamples, mode=mode)
+                u, std = self._predict_all(self._scale_bounds(Xsamples))
+                fvals = self._eim_from_mu_sigma(u, std, mode, dtype=np.float32)
             else:
                 fvals = self.CEIM_Hypervolume(Xsamples)
             if mode == 'all':
-                fmax = np.max(fvals,axis=0)
+                indmax = np.argmax(fvals,axis=0)
+                fmax = fvals[indmax,np.arange(fvals.shape[1])]
                 print(fvals.shape)
                 print(fmax.shape)
-                indmax = np.argmax(fvals,axis=0)
                 print(indmax)
                 xmax = Xsamples[indmax,:]
                 qual = xmax[:,-self.num_qual:].reshape(-1)
 
-                bnd = list(self.bounds[:,:self.num_quant].T)
-                bndlist = []
-
-                for element in bnd:
-                    bndlist.append(tuple(element))
-
                 modes = ['euclidean', 'hypervolume']
                 results = []
                 for i in range(2):
-                    results.append(stats.optimize.minimize(self.EIMoptimiserWrapper, xmax[i,:-self.num_qual].reshape(-1), args=(qual[i],constraints,modes[i]), bounds=bndlist,method='SLSQP'))
+                    results.append(stats.optimize.minimize(self.EIMoptimiserWrapper, xmax[i,:-self.num_qual].reshape(-1), args=(qual[i],constraints,modes[i],self._xbuffer(qual[i])), bounds=self._cont_bounds_tuple,method='SLSQP'))
 
                 xmax = np.concatenate((results[0].x, qual[0]),axis=None)
                 xmax = np.vstack((xmax,np.concatenate((results[1].x, qual[1]),axis=None)))
@@ -357,18 +489,17 @@ class MVMOO(MVO):
 
                 return fmax, xmax
 
-            fmax = np.amax(fvals)
-            indymax = np.argmax(fvals)
+            # Single pass over fvals for both the maximum and its location
+            indymax = int(np.argmax(fvals))
+            fmax = fvals.flat[indymax]
             xmax = Xsamples[indymax,:]
             qual = xmax[-self.num_qual:]
 
-            bnd = list(self.bounds[:,:self.num_quant].T)
-            bndlist = []
-
-            for element in bnd:
-                bndlist.append(tuple(element))
+            # No expected improvement anywhere in the scan, skip the local refinement
+            if values is None and fmax <= 1e-12:
+                return -fmax, xmax
 
-            result = stats.optimize.minimize(self.EIMoptimiserWrapper, xmax[:-self.num_qual].reshape(-1), args=(qual,constraints,mode), bounds=bndlist,method='SLSQP')
+            result = stats.optimize.minimize(self.EIMoptimiserWrapper, xmax[:-self.num_qual].reshape(-1), args=(qual,constraints,mode,self._xbuffer(qual)), bounds=self._cont_bounds_tuple,method='SLSQP')
             if values is None:
                 
                 return result.fun, np.concatenate((result.x, qual),axis=None)
@@ -382,16 +513,13 @@ class MVMOO(MVO):
     
     def AEIMmixedoptimiser(self, constraints, algorithm='Random', values=None):
 
-        # Get estimate for mean variance of model using halton sampling
-        X = self.sample_design(samples=10000, design='halton')
-        X = self.scaleX(X, mode='bounds')
-        varlist = []
-        for iobj in range(self.num_obj):
-            _ , var = self.models[iobj].predict_y(X)
-            varlist.append(var)
-
-        var = np.concatenate(varlist, axis=1)
-        meanvar = np.mean(var,axis=0)
+        # Get estimate for mean variance of model using halton sampling, the
+        # latent predictions are reused for the Random Local acquisition scan
+        Xsamples = self.sample_design(samples=10000, design='halton')
+        u, std = self._predict_all(self._scale_bounds(Xsamples), latent=True)
+        # predict_y variance is the latent variance plus the likelihood noise
+        noise = np.array([model.likelihood.variance.numpy() for model in self.models])
+        meanvar = np.mean(std**2,axis=0) + noise
 
         f = self.currentfront
 
@@ -402,37 +530,33 @@ class MVMOO(MVO):
 
         if algorithm == 'Random':
 
-            Xsamples = self.sample_design(samples=10000, design='halton')
-
             fvals = self.AEIM_Hypervolume(Xsamples)
 
-            fmax = np.amax(fvals)
-            indymax = np.argmax(fvals)
+            # Single pass over fvals for both the maximum and its location
+            indymax = int(np.argmax(fvals))
+            fmax = fvals.flat[indymax]
             xmax = Xsamples[indymax,:]
             if values is None:
                 return fmax, xmax
             return fmax, xmax, fvals, Xsamples
 
         elif algorithm == 'Random Local':
-            Xsamples = self.sample_design(samples=10000, design='halton')
-
             if constraints is False:
-                fvals = self.AEIM_Euclidean(Xsamples)
+                fvals = self._eim_from_mu_sigma(u, std, 'euclidean', c=self.contextual, dtype=np.float32)
             else:
                 raise NotImplementedError()
 
-            fmax = np.amax(fvals)
-            indymax = np.argmax(fvals)
+            # Single pass over fvals for both the maximum and its location
+            indymax = int(np.argmax(fvals))
+            fmax = fvals.flat[indymax]
             xmax = Xsamples[indymax,:]
             qual = xmax[-self.num_qual:]
 
-            bnd = list(self.bounds[:,:self.num_quant].T)
-            bndlist = []
-
-            for element in bnd:
-                bndlist.append(tuple(element))
+            # No expected improvement anywhere in the scan, skip the local refinement
+            if values is None and fmax <= 1e-12:
+                return -fmax, xmax
 
-            result = stats.optimize.minimize(self.AEIMoptimiserWrapper, xmax[:-self.num_qual].reshape(-1), args=(qual,constraints), bounds=bndlist,method='SLSQP')
+            result = stats.optimize.minimize(self.AEIMoptimiserWrapper, xmax[:-self.num_qual].reshape(-1), args=(qual,constraints,self._xbuffer(qual)), bounds=self._cont_bounds_tuple,method='SLSQP')
             if values is None:
                 
                 return result.fun, np.concatenate((result.x, qual),axis=None)
@@ -441,27 +565,18 @@ class MVMOO(MVO):
 
         elif algorithm == 'SHGO':
             if self.num_qual < 1:
-                bnd = list(self.bounds.T)
-                bndlist = []
-
-                for element in bnd:
-                    bndlist.append(tuple(element))
+                bndlist = list(map(tuple, self.bounds.T))
             
                 result = shgo(self.AEIM_Hypervolume,bndlist, sampling_method='sobol', n=30, iters=2)
                 
                 return result.x, result.fun
             else:
                 sample = self.sample_design(samples=1, design='random')
-                contbnd = list(self.bounds[:,:self.num_quant].T)
-                contbndlist = []
                 qual = sample[:,-self.num_qual:]
-
-                for element in contbnd:
-                    contbndlist.append(tuple(element))
                 resXstore = []
                 resFstore = []
                 for i in range(np.shape(qual)[0]):
-                    result = shgo(self.AEIMoptimiserWrapper, contbndlist, args=(qual[i,:]), sampling_method='sobol', n=30, iters=2)
+                    result = shgo(self.AEIMoptimiserWrapper, self._cont_bounds_tuple, args=(qual[i,:]), sampling_method='sobol', n=30, iters=2)
                     resXstore.append(result.x)
                     resFstore.append(result.fun)
 
@@ -473,27 +588,18 @@ class MVMOO(MVO):
 
         elif algorithm == 'DE':
             if self.num_qual < 1:
-                bnd = list(self.bounds.T)
-                bndlist = []
-
-                for element in bnd:
-                    bndlist.append(tuple(element))
+                bndlist = list(map(tuple, self.bounds.T))
             
                 result = differential_evolution(self.AEIM_Hypervolume,bndlist)
                 
                 return result.x, result.fun
             else:
                 sample = self.sample_design(samples=1, design='random')
-                contbnd = list(self.bounds[:,:self.num_quant].T)
-                contbndlist = []
                 qual = sample[:,-self.num_qual:]
-
-                for element in contbnd:
-                    contbndlist.append(tuple(element))
                 resXstore = []
                 resFstore = []
                 for i in range(np.shape(qual)[0]):
-                    result = dual_annealing(self.AEIMoptimiserWrapper, contbndlist, args=(qual[i,:]))
+                    result = dual_annealing(self.AEIMoptimiserWrapper, self._cont_bounds_tuple, args=(qual[i,:]))
                     resXstore.append(result.x)
                     resFstore.append(result.fun)
 
@@ -511,29 +617,21 @@ class MVMOO(MVO):
         Suggest the next condition for evaluation
         """
         if constraints is False:
-            try:
-                self.k_type = 'matern3'
-                self.models = self.generatemodels(X, Y)
-            except:
-                print('Initial model optimisation failed, retrying with new kernel')
-                try:
-                    self.k_type = 'matern5'
-                    self.models = self.generatemodels(X, Y)
-                except:
-                    print('Model optimisation failed, retrying with new value of variance')
-                    for variance in [0.1,1,2,10]:
-                        try:
-                            self.models = self.generatemodels(X, Y, variance=variance)
-                        except:
-                            print('Model optimisation failed, retrying with new value of variance')
-
-            self.currentfront = self.paretofront(self.Yscaled)
-
-            means = []
-            for model in self.models:
-                mean, _ = model.predict_y(self.sample_design(samples=2, design='halton'))
-                means.append(mean.numpy())
-            if np.any(means == np.nan):
+            # Sweep kernel and starting variance until the models fit
+            for k_type, variance in [('matern3',1.0),('matern5',1.0),('matern3',0.1),('matern3',2.0),('matern3',10.0)]:
+                self.k_type = k_type
+                success, models = self._try_fit(X, Y, variance=variance)
+                if success:
+                    self.models = models
+                    break
+                print('Model optimisation failed, retrying with new kernel or variance')
+            else:
+                raise RuntimeError('Unable to fit models with any kernel and variance combination')
+
+            self._set_front(self.paretofront(self.Yscaled))
+
+            means, _ = self._predict_all(self.sample_design(samples=2, design='halton'))
+            if np.isnan(means).any():
                 print("Retraining model with new starting variance")
                 self.models = self.generatemodels(X, Y, variance=0.1)
 
@@ -550,7 +648,7 @@ class MVMOO(MVO):
                 return np.unique(xmax.round(6),axis=0), fmax
  
         self.models = self.generatemodels(X,Y)
-        self.currentfront = self.paretofront(self.Yscaled)
+        self._set_front(self.paretofront(self.Yscaled))
         self.constrainedmodels = self.generatemodels(X, constraints, scale=False)
 
         fmax, xmax = self.EIMmixedoptimiser(constraints, algorithm='Simplical')